@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# ==========================================
+# Startup Benchmark
+# 新しいプロセスで計測 (= コンテナ起動直後のコールドスタート相当)
+#
+#   python bench_startup.py            # 予算を超えたら exit 1
+# ==========================================
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 秒単位の予算 (各計測の中央値で判定)
+BUDGET = {
+    "range_dynamics_checker.py": 2.0,
+    "nlhe_range_check.py": 2.0,
+}
+
+# 既定のセッション状態 (既定レンジ・ボード) での最初のページ表示 = ユーザーが最初に見るページ
+_APP = """
+import sys, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+if at.exception: raise SystemExit(at.exception[0].message)
+print(time.perf_counter() - t)
+"""
+
+def _measure(code, *args):
+    out = subprocess.run([sys.executable, "-c", code, *args], cwd=HERE, capture_output=True, text=True)
+    if out.returncode != 0: raise SystemExit(out.stderr or out.stdout)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def run_bench(repeat=5):
+    results = {}
+    for name in BUDGET:
+        samples = [_measure(_APP, os.path.join(HERE, name)) for _ in range(repeat)]
+        results[name] = sorted(samples)[len(samples) // 2]
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure cold-start time against the startup budget.")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args()
+    results = run_bench(a.repeat)
+    over = [n for n, t in results.items() if t > BUDGET[n]]
+    if a.json: print(json.dumps({"results": results, "budget": BUDGET, "over": over}))
+    else:
+        for n, t in results.items():
+            print(f"{n:<28} {t:7.3f}s  (budget {BUDGET[n]:.3f}s){'  OVER' if n in over else ''}")
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
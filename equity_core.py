@@ -0,0 +1,159 @@
+import random
+import itertools
+from treys import Card, Evaluator
+
+# ==========================================
+# Headless equity engine (Streamlit 非依存)
+# バッチ処理・CLIツールから共通で使う
+# ==========================================
+RANKS = "23456789TJQKA"
+SUITS = "shdc"
+
+def str_to_card(card_str):
+    clean = card_str.replace("10", "T").replace("0", "T")
+    try: return Card.new(clean)
+    except: return None
+
+def card_to_str(card_int): return Card.int_to_str(card_int)
+
+FULL_DECK = [str_to_card(r+s) for r in RANKS for s in SUITS]
+
+_evaluator = None
+def get_evaluator():
+    # プロセスごとに1回だけルックアップテーブルを構築
+    global _evaluator
+    if _evaluator is None: _evaluator = Evaluator()
+    return _evaluator
+
+def parse_range_notation(range_str):
+    ranks = '23456789TJQKA'; suits = 'cdhs'; combos = []
+    if not range_str: return []
+    parts = [p.strip() for p in range_str.split(',')]
+    for part in parts:
+        if len(part) < 2: continue
+        part = part.replace("10", "T")
+        if len(part) == 4 and part[1] in suits and part[3] in suits:
+            try:
+                c1 = str_to_card(part[:2]); c2 = str_to_card(part[2:])
+                if c1 and c2: combos.append([c1, c2])
+                continue
+            except: pass
+        try:
+            r1=part[0]; r2=part[1]; r1i=ranks.find(r1); r2i=ranks.find(r2)
+            if r1i==-1 or r2i==-1: continue
+            is_plus='+' in part; is_s='s' in part; is_o='o' in part
+            if r1i == r2i:
+                top = 12 if is_plus else r1i
+                for r in range(r1i, top+1):
+                    for i in range(4):
+                        for j in range(i+1, 4): combos.append([str_to_card(ranks[r]+suits[i]), str_to_card(ranks[r]+suits[j])])
+            else:
+                if r1i < r2i: r1i, r2i, r1, r2 = r2i, r1i, r2, r1
+                top_k = r1i - 1 if is_plus else r2i
+                for k in range(r2i, top_k+1):
+                    if is_s or (not is_o and not is_s):
+                        for s in suits: combos.append([str_to_card(r1+s), str_to_card(ranks[k]+s)])
+                    if is_o or (not is_o and not is_s):
+                        for s1 in suits:
+                            for s2 in suits:
+                                if s1!=s2: combos.append([str_to_card(r1+s1), str_to_card(ranks[k]+s2)])
+        except: continue
+    return combos
+
+# ==========================================
+# Equity
+# ==========================================
+def simulate_equity(hero_range, villain_range, board, iterations=1000, rng=random):
+    # 衝突したサンプルは捨て、有効サンプル数で割る -> (equity, 有効サンプル数)
+    if not hero_range or not villain_range: return 0.0, 0
+    evaluator = get_evaluator()
+    h_wins = 0; ties = 0; valid = 0
+    need = max(0, 5 - len(board))
+    for _ in range(iterations):
+        hh = rng.choice(hero_range); vh = rng.choice(villain_range)
+        used = set(board) | set(hh) | set(vh)
+        if len(used) != len(board) + 4: continue
+        rem = [c for c in FULL_DECK if c not in used]
+        run = rng.sample(rem, need) if need > 0 else []
+        final_board = board + run
+        hs = evaluator.evaluate(final_board, hh)
+        vs = evaluator.evaluate(final_board, vh)
+        valid += 1
+        if hs < vs: h_wins += 1
+        elif hs == vs: ties += 1
+    if valid == 0: return 0.0, 0
+    return (h_wins + ties/2) / valid * 100, valid
+
+def calculate_equity(hero_range, villain_range, board, iterations=1000, rng=random):
+    return simulate_equity(hero_range, villain_range, board, iterations, rng)[0]
+
+def exact_equity(hero_hand, villain_hand, board):
+    # 2つのハンドが確定している場合の全ランアウト列挙 -> (勝ち, 引き分け, 総数)
+    evaluator = get_evaluator()
+    used = set(board) | set(hero_hand) | set(villain_hand)
+    rem = [c for c in FULL_DECK if c not in used]
+    wins = 0; ties = 0; total = 0
+    for run in itertools.combinations(rem, max(0, 5 - len(board))):
+        final_board = board + list(run)
+        hs = evaluator.evaluate(final_board, hero_hand)
+        vs = evaluator.evaluate(final_board, villain_hand)
+        total += 1
+        if hs < vs: wins += 1
+        elif hs == vs: ties += 1
+    return wins, ties, total
+
+def exact_range_equity(hero_range, villain_range, board):
+    # サンプラーの期待値と同じ定義: 衝突しない組み合わせを等確率で平均
+    total = 0.0; pairs = 0
+    for hh in hero_range:
+        for vh in villain_range:
+            if len(set(board) | set(hh) | set(vh)) != len(board) + 4: continue
+            wins, ties, n = exact_equity(hh, vh, board)
+            total += (wins + ties/2) / n; pairs += 1
+    if pairs == 0: return 0.0
+    return total / pairs * 100
+
+def runout_metrics(hero_range, villain_range, board, iterations=500, rng=random):
+    # Dynamicsセクションと同じ指標 (Risk / Scare / Safe)
+    eq = calculate_equity(hero_range, villain_range, board, iterations, rng)
+    losses = []
+    for c in FULL_DECK:
+        if c in board: continue
+        losses.append(eq - calculate_equity(hero_range, villain_range, board + [c], iterations, rng))
+    bad = [l for l in losses if l > 0]
+    return {
+        "equity": eq,
+        "risk": sum(bad),
+        "scare": len([l for l in bad if l > 5]),
+        "safe": len(losses) - len(bad),
+    }
+
+# ==========================================
+# Flop enumeration
+# ==========================================
+SUIT_PERMUTATIONS = list(itertools.permutations(SUITS))
+
+def _relabel(cards_str, perm):
+    mapping = dict(zip(SUITS, perm))
+    return tuple(sorted(c[0] + mapping[c[1]] for c in cards_str))
+
+def canonical_flop(flop_str):
+    return min(_relabel(flop_str, p) for p in SUIT_PERMUTATIONS)
+
+def all_flops():
+    # (flop, weight) を決定的な順序で返す: 22,100通り
+    deck = [r+s for r in RANKS for s in SUITS]
+    for flop in itertools.combinations(deck, 3): yield flop, 1
+
+def isomorphic_flops():
+    # スート同型クラスの代表 (1,755通り) と、そのクラスに属するフロップ数
+    classes = {}
+    for flop, _ in all_flops():
+        key = canonical_flop(flop)
+        classes[key] = classes.get(key, 0) + 1
+    for key in sorted(classes): yield key, classes[key]
+
+def is_suit_symmetric(combos):
+    # 全スート置換で不変なレンジなら同型クラスの集計が有効
+    hands = {tuple(sorted(card_to_str(c) for c in h)) for h in combos}
+    return all({_relabel(h, p) for h in hands} == hands for p in SUIT_PERMUTATIONS)
@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import random
+import argparse
+from multiprocessing import Pool
+
+from equity_core import (
+    str_to_card, parse_range_notation, runout_metrics,
+    all_flops, isomorphic_flops, is_suit_symmetric,
+)
+
+# ==========================================
+# Bulk Flop Report
+# 全フロップ (または同型クラス) について Equity と Risk/Scare/Safe を集計し、
+# チャンク単位で CSV / Parquet に書き出す。チェックポイントから再開可能。
+#
+#   python flop_report.py --hero "QQ+, AKs, AKo" --villain "TT+, AJs+, KQs, AQo+" \
+#       --iso --format parquet --output report_parquet
+# ==========================================
+COLUMNS = ["flop", "weight", "equity", "risk", "scare", "safe"]
+
+_job = {}
+def _init_worker(hero_str, villain_str, iterations, seed):
+    _job["hero"] = parse_range_notation(hero_str)
+    _job["villain"] = parse_range_notation(villain_str)
+    _job["iterations"] = iterations
+    _job["seed"] = seed
+
+def _analyze_flop(item):
+    flop, weight = item
+    flop_str = "".join(flop)
+    # フロップごとに固定シード -> 再開しても同じ結果
+    rng = random.Random(f"{_job['seed']}-{flop_str}")
+    board = [str_to_card(c) for c in flop]
+    m = runout_metrics(_job["hero"], _job["villain"], board, _job["iterations"], rng)
+    return {"flop": flop_str, "weight": weight, **m}
+
+# ==========================================
+# Writers
+# ==========================================
+class CsvSink:
+    def __init__(self, path, offset):
+        exists = os.path.exists(path)
+        self.f = open(path, "r+" if exists else "w", newline="")
+        # 最後のチェックポイント以降の書きかけ部分を捨てる
+        self.f.seek(offset); self.f.truncate()
+        self.w = csv.DictWriter(self.f, fieldnames=COLUMNS)
+        if offset == 0: self.w.writeheader()
+
+    def write(self, rows):
+        self.w.writerows(rows)
+        self.f.flush(); os.fsync(self.f.fileno())
+        return {"offset": self.f.tell()}
+
+    def close(self): self.f.close()
+
+class ParquetSink:
+    # Parquet は追記できないので、チャンクごとに part ファイルを書く (データセット形式)
+    def __init__(self, path, parts):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow), or use --format csv")
+        self.pa, self.pq = pa, pq
+        self.path = path; self.parts = parts
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, rows):
+        table = self.pa.Table.from_pylist(rows).select(COLUMNS)
+        name = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+        self.pq.write_table(table, name + ".tmp")
+        os.replace(name + ".tmp", name)
+        self.parts += 1
+        return {"parts": self.parts}
+
+    def close(self): pass
+
+def _load_checkpoint(path, config):
+    if not os.path.exists(path): return {"done": 0, "offset": 0, "parts": 0}
+    with open(path) as f: ckpt = json.load(f)
+    if ckpt.get("config") != config:
+        raise SystemExit(f"Checkpoint {path} was written with different settings. Delete it or use a new --output.")
+    return ckpt
+
+def _save_checkpoint(path, ckpt):
+    with open(path + ".tmp", "w") as f: json.dump(ckpt, f)
+    os.replace(path + ".tmp", path)
+
+# ==========================================
+# Main
+# ==========================================
+def run_report(hero_str, villain_str, output, fmt="csv", iso=False, iterations=500,
+               chunk_size=50, processes=None, seed=0, log=print):
+    hero = parse_range_notation(hero_str); villain = parse_range_notation(villain_str)
+    if not hero or not villain: raise SystemExit("Both hero and villain ranges must be non-empty")
+    if iso and not (is_suit_symmetric(hero) and is_suit_symmetric(villain)):
+        raise SystemExit("--iso requires suit-symmetric ranges (no specific-suit hands)")
+
+    config = {"hero": hero_str, "villain": villain_str, "format": fmt, "iso": iso,
+              "iterations": iterations, "seed": seed}
+    ckpt_path = output.rstrip("/") + ".ckpt.json"
+    ckpt = _load_checkpoint(ckpt_path, config); ckpt["config"] = config
+
+    flops = list(isomorphic_flops() if iso else all_flops())
+    total = len(flops); todo = flops[ckpt["done"]:]
+    if not todo:
+        log(f"Already complete ({total} flops)"); return
+    log(f"{total} flops, resuming at {ckpt['done']}" if ckpt["done"] else f"{total} flops")
+
+    sink = CsvSink(output, ckpt["offset"]) if fmt == "csv" else ParquetSink(output, ckpt["parts"])
+    buf = []
+    try:
+        with Pool(processes, initializer=_init_worker, initargs=(hero_str, villain_str, iterations, seed)) as pool:
+            # imap は順序を保つので、done 件数だけで再開位置が決まる
+            for row in pool.imap(_analyze_flop, todo, chunksize=4):
+                buf.append(row)
+                if len(buf) >= chunk_size:
+                    ckpt.update(sink.write(buf)); ckpt["done"] += len(buf); buf = []
+                    _save_checkpoint(ckpt_path, ckpt)
+                    log(f"{ckpt['done']}/{total}")
+        if buf:
+            ckpt.update(sink.write(buf)); ckpt["done"] += len(buf)
+            _save_checkpoint(ckpt_path, ckpt)
+            log(f"{ckpt['done']}/{total}")
+    finally:
+        sink.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Aggregate hero-vs-villain equity and next-card risk over every flop.")
+    ap.add_argument("--hero", default="QQ+, AKs, AKo")
+    ap.add_argument("--villain", default="TT+, AJs+, KQs, AQo+")
+    ap.add_argument("--output", required=True, help="CSV file, or directory of part files for parquet")
+    ap.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    ap.add_argument("--iso", action="store_true", help="Only the 1,755 suit-isomorphic flops (weighted)")
+    ap.add_argument("--iterations", type=int, default=500)
+    ap.add_argument("--chunk-size", type=int, default=50, help="Rows buffered before each write/checkpoint")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    run_report(a.hero, a.villain, a.output, a.format, a.iso, a.iterations, a.chunk_size, a.processes, a.seed)
+
+if __name__ == "__main__":
+    main()
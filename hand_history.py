@@ -0,0 +1,239 @@
+import os
+import re
+import csv
+import gzip
+import random
+import argparse
+import itertools
+from functools import lru_cache
+from collections import deque
+from multiprocessing import Pool
+
+from equity_core import str_to_card, calculate_equity, exact_equity, SUIT_PERMUTATIONS, SUITS
+
+# ==========================================
+# Hand History Importer
+# テキストのハンド履歴 (PokerStars 形式) をストリーミングで読み、
+# ヘッズアップのオールイン局面を抽出して Equity / All-in EV を計算する。
+# 結果は計算できた順に CSV へ書き出す (メモリ使用量は一定)。
+#
+#   python hand_history.py histories/ --output allin_ev.csv
+# ==========================================
+COLUMNS = ["hand_id", "player", "opponent", "cards", "opp_cards", "allin_board", "final_board",
+           "method", "equity", "pot", "invested", "won", "ev_won", "ev_diff"]
+
+HAND_START = re.compile(r"^\w[\w ]* Hand #(\d+)")
+SEAT = re.compile(r"^Seat \d+: (.+?) \([^)]*(?:in chips|chips)")
+STREET = re.compile(r"^\*\*\* (FLOP|TURN|RIVER) \*\*\*")
+BRACKETS = re.compile(r"\[([^\]]+)\]")
+DEALT = re.compile(r"^Dealt to (.+?) \[([^\]]+)\]")
+SHOWS = re.compile(r"^(.+?): shows \[([^\]]+)\]")
+SHOWED = re.compile(r"^Seat \d+: (.+?) (?:\(.*?\) )?(?:showed|mucked) \[([^\]]+)\]")
+ACTION = re.compile(r"^(.+?): (posts|checks|calls|bets|raises|folds)(.*)$")
+UNCALLED = re.compile(r"^Uncalled bet \(([^)]+)\) returned to (.+)$")
+COLLECTED = re.compile(r"^(.+?) collected (\S+) from")
+TOTAL = re.compile(r"^Total pot (\S+).*?(?:Rake (\S+))?$")
+AMOUNT = re.compile(r"[\d,]*\.?\d+")
+
+def _amount(text):
+    m = AMOUNT.findall(text)
+    return float(m[-1].replace(",", "")) if m else 0.0
+
+# ==========================================
+# Streaming reader / parser
+# ==========================================
+def _open(path):
+    if path.endswith(".gz"): return gzip.open(path, "rt", encoding="utf-8-sig", errors="replace")
+    return open(path, encoding="utf-8-sig", errors="replace")
+
+def iter_paths(inputs):
+    for p in inputs:
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                for name in sorted(files):
+                    if name.endswith((".txt", ".txt.gz")): yield os.path.join(root, name)
+        else: yield p
+
+def iter_hands(paths):
+    # 1ハンドずつ行リストを返す -> ファイル全体を読み込まない
+    for path in paths:
+        with _open(path) as f:
+            lines = []
+            for line in f:
+                line = line.strip()
+                if HAND_START.match(line) and lines:
+                    yield lines; lines = []
+                if line: lines.append(line)
+            if lines: yield lines
+
+def parse_allin_spot(lines):
+    # ヘッズアップで両者のハンドが分かっているオールインだけを返す (それ以外は None)
+    m = HAND_START.match(lines[0])
+    if not m: return None
+    hand_id = m.group(1)
+    # involved: ブラインド/配札/アクションがあったプレイヤー (sitting out の席は含めない)
+    seats = []; board = []; known = {}; folded = set(); involved = set()
+    street_commit = {}; invested = {}; collected = {}
+    allin_board = None; action_after_allin = False; total_pot = 0.0; rake = 0.0
+    for line in lines[1:]:
+        sm = SEAT.match(line)
+        if sm and sm.group(1) not in seats: seats.append(sm.group(1)); continue
+        st = STREET.match(line)
+        if st:
+            board = [c for grp in BRACKETS.findall(line) for c in grp.split()]
+            street_commit = {}; continue
+        dm = DEALT.match(line) or SHOWS.match(line) or SHOWED.match(line)
+        if dm:
+            cards = dm.group(2).split()
+            if len(cards) == 2: known[dm.group(1)] = cards
+            involved.add(dm.group(1)); continue
+        um = UNCALLED.match(line)
+        if um:
+            p = um.group(2); invested[p] = invested.get(p, 0.0) - _amount(um.group(1)); continue
+        cm = COLLECTED.match(line)
+        if cm: collected[cm.group(1)] = collected.get(cm.group(1), 0.0) + _amount(cm.group(2)); continue
+        tm = TOTAL.match(line)
+        if tm:
+            total_pot = _amount(tm.group(1)); rake = _amount(tm.group(2)) if tm.group(2) else 0.0; continue
+        am = ACTION.match(line)
+        if not am: continue
+        p, verb, rest = am.groups()
+        involved.add(p)
+        if verb == "folds": folded.add(p); continue
+        if verb == "checks": continue
+        if allin_board is not None and verb in ("bets", "raises") and len(board) > allin_board:
+            action_after_allin = True
+        if verb == "posts":
+            amt = _amount(rest)
+            # アンテは街のコミットに含めない
+            if "ante" not in rest: street_commit[p] = street_commit.get(p, 0.0) + amt
+            invested[p] = invested.get(p, 0.0) + amt
+        elif verb == "raises":
+            to = _amount(rest); prev = street_commit.get(p, 0.0)
+            invested[p] = invested.get(p, 0.0) + to - prev; street_commit[p] = to
+        else:
+            amt = _amount(rest)
+            invested[p] = invested.get(p, 0.0) + amt; street_commit[p] = street_commit.get(p, 0.0) + amt
+        if "all-in" in rest: allin_board = len(board)
+    if allin_board is None or action_after_allin: return None
+    active = [p for p in seats if p in involved and p not in folded]
+    if len(active) != 2 or not all(p in known for p in active): return None
+    # 自分 (Dealt to) がいればそちらを player にする
+    dealt = next((DEALT.match(l).group(1) for l in lines if DEALT.match(l)), None)
+    if dealt == active[1]: active.reverse()
+    player, opponent = active
+    pot = total_pot - rake if total_pot else sum(invested.values())
+    return {
+        "hand_id": hand_id, "player": player, "opponent": opponent,
+        "cards": known[player], "opp_cards": known[opponent],
+        "allin_board": board[:allin_board], "final_board": board,
+        "pot": pot, "invested": invested.get(player, 0.0), "won": collected.get(player, 0.0),
+    }
+
+# ==========================================
+# Equity (worker side)
+# ==========================================
+_job = {}
+def _init_worker(exact_limit, samples, seed):
+    _job.update(exact_limit=exact_limit, samples=samples, seed=seed)
+
+def _canonical(cards, opp_cards, board):
+    # スート同型なら同じキー -> 同じ局面の再計算を避ける
+    best = None
+    for perm in SUIT_PERMUTATIONS:
+        mp = dict(zip(SUITS, perm))
+        key = tuple(tuple(sorted(c[0] + mp[c[1]] for c in grp)) for grp in (cards, opp_cards, board))
+        if best is None or key < best: best = key
+    return best
+
+@lru_cache(maxsize=100000)
+def _equity(key):
+    hh, vh, board = ([str_to_card(c) for c in grp] for grp in key)
+    need = 5 - len(board)
+    n_runouts = 1
+    for i in range(need): n_runouts = n_runouts * (48 - len(board) - i) // (i + 1)
+    if n_runouts <= _job["exact_limit"]:
+        wins, ties, total = exact_equity(hh, vh, board)
+        return "exact", (wins + ties/2) / total * 100
+    # 列挙数が多すぎる (主にプリフロップ) 場合はサンプリング
+    rng = random.Random(f"{_job['seed']}-{key}")
+    return "mc", calculate_equity([hh], [vh], board, _job["samples"], rng)
+
+def _evaluate_batch(spots):
+    rows = []
+    for s in spots:
+        method, eq = _equity(_canonical(s["cards"], s["opp_cards"], s["allin_board"]))
+        ev_won = eq / 100 * s["pot"]
+        rows.append({
+            "hand_id": s["hand_id"], "player": s["player"], "opponent": s["opponent"],
+            "cards": "".join(s["cards"]), "opp_cards": "".join(s["opp_cards"]),
+            "allin_board": "".join(s["allin_board"]), "final_board": "".join(s["final_board"]),
+            "method": method, "equity": round(eq, 4), "pot": s["pot"], "invested": s["invested"],
+            "won": s["won"], "ev_won": round(ev_won, 4), "ev_diff": round(ev_won - s["won"], 4),
+        })
+    return rows
+
+# ==========================================
+# Main
+# ==========================================
+def new_stats():
+    return {"hands": 0, "spots": 0, "skipped": 0, "errors": 0, "first_error": None}
+
+def iter_spots(paths, stats):
+    # 読んだハンド数・対象外・パースエラーを数える (フォーマット変更で黙って空になるのを防ぐ)
+    for lines in iter_hands(paths):
+        stats["hands"] += 1
+        try: spot = parse_allin_spot(lines)
+        except Exception as e:
+            stats["errors"] += 1
+            if stats["first_error"] is None: stats["first_error"] = f"{lines[0]}: {e!r}"
+            continue
+        if spot:
+            stats["spots"] += 1; yield spot
+        else: stats["skipped"] += 1
+
+def format_stats(stats):
+    msg = (f"{stats['hands']} hands read, {stats['spots']} all-in spots, "
+           f"{stats['skipped']} skipped, {stats['errors']} parse errors")
+    if stats["first_error"]: msg += f" (first error: {stats['first_error']})"
+    return msg
+
+def run_import(inputs, output, batch_size=256, processes=None, exact_limit=50000, samples=20000,
+               seed=0, log=print):
+    processes = processes or os.cpu_count() or 1
+    max_inflight = processes * 4
+    stats = new_stats(); n_rows = 0
+    with open(output, "w", newline="") as f, \
+         Pool(processes, initializer=_init_worker, initargs=(exact_limit, samples, seed)) as pool:
+        w = csv.DictWriter(f, fieldnames=COLUMNS); w.writeheader()
+        pending = deque()
+        def drain():
+            nonlocal n_rows
+            rows = pending.popleft().get()
+            w.writerows(rows); f.flush(); n_rows += len(rows)
+        spots = iter_spots(iter_paths(inputs), stats)
+        while True:
+            batch = list(itertools.islice(spots, batch_size))
+            if not batch: break
+            pending.append(pool.apply_async(_evaluate_batch, (batch,)))
+            # 投入済みバッチ数に上限を設け、読み込みが計算より先行しすぎないようにする
+            if len(pending) >= max_inflight:
+                drain(); log(f"{n_rows} rows written, {format_stats(stats)}")
+        while pending: drain()
+    log(f"{format_stats(stats)} -> {n_rows} rows in {output}")
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser(description="Compute all-in equity and EV-adjusted results from hand histories.")
+    ap.add_argument("inputs", nargs="+", help="Hand history files (.txt / .txt.gz) or directories")
+    ap.add_argument("--output", required=True)
+    ap.add_argument("--batch-size", type=int, default=256)
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--exact-limit", type=int, default=50000, help="Max runouts to enumerate exactly (flop/turn/river are always below the default)")
+    ap.add_argument("--samples", type=int, default=20000, help="Monte Carlo samples when enumeration exceeds --exact-limit")
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    run_import(a.inputs, a.output, a.batch_size, a.processes, a.exact_limit, a.samples, a.seed)
+
+if __name__ == "__main__":
+    main()
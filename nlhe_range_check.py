@@ -1,22 +1,32 @@
 import streamlit as st
 import eval7
+import os
+import json
 import random
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+# pandas / plotly は重いので、使うセクションの描画時にだけ import する
 
 st.set_page_config(page_title="Poker Equity Tool", layout="wide")
 
 # ==========================================
 # 0. 設定 & データ管理
 # ==========================================
+def default_iterations(engine, fallback=500):
+    # validate_equity.py --write の計測結果から、目標精度を満たす反復回数を既定値にする
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "equity_accuracy.json")) as f: data = json.load(f)
+        n = data["engines"][engine]["iterations_to_accuracy"][str(data["default_target"])]
+        return max(100, min(5000, round(n / 100) * 100)), data["default_target"]
+    except: return fallback, None
+
 with st.sidebar:
     st.header("🔧 Settings")
     st.markdown("**Simulation Accuracy**")
+    def_iter, def_target = default_iterations("nlhe_range_check.py")
     sim_iterations = st.slider(
         "Iterations per Hand", 
-        min_value=100, max_value=5000, value=500, step=100,
+        min_value=100, max_value=5000, value=def_iter, step=100,
         help="数値を上げると計算精度が高くなりますが、待ち時間が長くなります。"
+             + (f" 既定値は ±{def_target}% (95%) の精度 (validate_equity.py で計測)。" if def_target else "")
     )
     st.divider()
     if st.button("Reset App (Clear All)", type="primary"):
@@ -155,11 +165,12 @@ def render_specific_hand_builder(player_key):
 # ==========================================
 # 計算ロジック
 # ==========================================
-def calculate_equity(hero_range, villain_range, board, iterations=1000, silent=False):
-    h_wins = 0; ties = 0; deck = [eval7.Card(r+s) for r in '23456789TJQKA' for s in 'cdhs']
+def simulate_equity(hero_range, villain_range, board, iterations=1000):
+    # 衝突したサンプルは捨て、有効サンプル数で割る (validate_equity.py で検証) -> (equity, 有効サンプル数)
+    h_wins = 0; ties = 0; valid = 0; deck = [eval7.Card(r+s) for r in '23456789TJQKA' for s in 'cdhs']
     for c in board: 
         if c in deck: deck.remove(c)
-    if not hero_range or not villain_range: return 0.0
+    if not hero_range or not villain_range: return 0.0, 0
     
     for i in range(iterations):
         hh = random.choice(hero_range); vh = random.choice(villain_range)
@@ -172,11 +183,17 @@ def calculate_equity(hero_range, villain_range, board, iterations=1000, silent=F
         run = random.sample(rem, need) if need>0 else []
         hs = eval7.evaluate(hh + board + run)
         vs = eval7.evaluate(vh + board + run)
+        valid += 1
         if hs > vs: h_wins += 1
         elif hs == vs: ties += 1
-    return (h_wins + ties/2) / iterations * 100
+    if valid == 0: return 0.0, 0
+    return (h_wins + ties/2) / valid * 100, valid
+
+def calculate_equity(hero_range, villain_range, board, iterations=1000, silent=False):
+    return simulate_equity(hero_range, villain_range, board, iterations)[0]
 
 def analyze_runouts(hero_range, villain_range, board, iterations=500):
+    import pandas as pd
     all_c = [eval7.Card(r+s) for r in '23456789TJQKA' for s in 'cdhs']
     deck = [c for c in all_c if c not in board]
     res = []
@@ -185,12 +202,62 @@ def analyze_runouts(hero_range, villain_range, board, iterations=500):
     prog = st.progress(0); total = len(deck)
     
     for idx, c in enumerate(deck):
-        eq = calculate_equity(hero_range, villain_range, board + [c], iterations, True)
-        res.append({"Card": str(c), "Rank": str(c)[0], "Suit": str(c)[1], "Equity": eq})
+        eq, n = simulate_equity(hero_range, villain_range, board + [c], iterations)
+        res.append({"Card": str(c), "Rank": str(c)[0], "Suit": str(c)[1], "Equity": eq, "Samples": n})
         prog.progress((idx+1)/total)
     prog.empty(); status.empty()
     return pd.DataFrame(res)
 
+# ==========================================
+# Board Tree (ストリート間の結果再利用)
+# ==========================================
+def get_board_tree(hero_str, villain_str):
+    # レンジが変わったらツリーを作り直す
+    key = (hero_str, villain_str)
+    if st.session_state.get('board_tree_key') != key:
+        st.session_state['board_tree_key'] = key
+        st.session_state['board_tree'] = {}
+    return st.session_state['board_tree']
+
+def get_board_node(tree, board):
+    key = tuple(sorted(str(c) for c in board))
+    # n: 有効サンプル数 (重み), requested: 要求した反復回数 (追加サンプリングの判定用)
+    return tree.setdefault(key, {"eq": 0.0, "n": 0, "requested": 0,
+                                 "runouts": None, "runouts_n": 0, "dist": None, "dist_n": 0})
+
+def merge_estimate(node, eq, n, requested):
+    if n > 0:
+        node["eq"] = (node["eq"] * node["n"] + eq * n) / (node["n"] + n)
+        node["n"] += n
+    node["requested"] += requested
+
+def cached_equity(tree, hero_range, villain_range, board, iterations):
+    # 前ストリートの1枚ごとの推定値をウォームスタートにし、不足分だけ追加サンプリング
+    node = get_board_node(tree, board)
+    if node["requested"] < iterations:
+        extra = iterations - node["requested"]
+        eq, n = simulate_equity(hero_range, villain_range, board, extra)
+        merge_estimate(node, eq, n, extra)
+    return node["eq"]
+
+def cached_runouts(tree, hero_range, villain_range, board, iterations):
+    node = get_board_node(tree, board)
+    if node["runouts"] is None or node["runouts_n"] < iterations:
+        df = analyze_runouts(hero_range, villain_range, board, iterations)
+        node["runouts"] = df; node["runouts_n"] = iterations
+        # 次のカードごとの結果を子ノードに保存 -> ヒートマップで進んだ時に再利用
+        for c, eq, n in zip(df["Card"], df["Equity"], df["Samples"]):
+            merge_estimate(get_board_node(tree, board + [eval7.Card(c)]), eq, int(n), iterations)
+    return node["runouts"].copy()
+
+def cached_distribution(tree, hero_range, villain_range, board, iterations):
+    # ボードを戻した時にも再計算しない
+    node = get_board_node(tree, board)
+    if node["dist"] is None or node["dist_n"] < iterations:
+        node["dist"] = analyze_range_distribution(hero_range, villain_range, board, iterations)
+        node["dist_n"] = iterations
+    return node["dist"]
+
 def analyze_range_distribution(hero_range, villain_range, board, iterations=500):
     st.caption(f"Calculating Distribution ({iterations} iterations)...")
     size = 100
@@ -224,6 +291,7 @@ with st.container():
         hero_input = st.text_area("Hero Input", key="hero_range_val", height=70)
         h_combos = parse_range_notation(hero_input)
         if h_combos:
+            import plotly.express as px
             grid_h = create_range_grid_visual(h_combos)
             lbl = list("AKQJT98765432")
             fig_h = px.imshow(grid_h, x=lbl, y=lbl, color_continuous_scale=["lightgrey", "blue"], zmin=0, zmax=1)
@@ -245,6 +313,7 @@ with st.container():
         villain_input = st.text_area("Villain Input", key="villain_range_val", height=70)
         v_combos = parse_range_notation(villain_input)
         if v_combos:
+            import plotly.express as px
             grid_v = create_range_grid_visual(v_combos)
             lbl = list("AKQJT98765432")
             fig_v = px.imshow(grid_v, x=lbl, y=lbl, color_continuous_scale=["lightgrey", "red"], zmin=0, zmax=1)
@@ -289,7 +358,8 @@ villain_range = parse_range_notation(villain_input)
 
 if hero_range and villain_range:
     # Current Equity
-    eq = calculate_equity(hero_range, villain_range, board_objs, iterations=sim_iterations)
+    tree = get_board_tree(hero_input, villain_input)
+    eq = cached_equity(tree, hero_range, villain_range, board_objs, sim_iterations)
     c1,c2,c3 = st.columns([1,2,1])
     with c1: st.metric("Hero Win%", f"{eq:.1f}%")
     with c2: st.progress(eq/100)
@@ -311,8 +381,11 @@ if hero_range and villain_range:
         * **Scare Cards:** 勝率が5%以上急落する「事故カード」の枚数。
         """)
 
-    if len(board_objs) < 5:
-        df = analyze_runouts(hero_range, villain_range, board_objs, iterations=sim_iterations)
+    # 次のカード全通り + レンジ分布は重いので、要求されるまで実行しない (初回表示を速くする)
+    run_dynamics = st.toggle("Analyze next cards & range distribution", key="run_dynamics",
+                             help=f"Simulates every next card and 200 sampled hands ({sim_iterations} iter each)")
+    if len(board_objs) < 5 and run_dynamics:
+        df = cached_runouts(tree, hero_range, villain_range, board_objs, sim_iterations)
         
         # --- 追加された指標の計算 ---
         # 1. 現在のEquity(eq) より下がっているカードを抽出
@@ -337,6 +410,7 @@ if hero_range and villain_range:
             st.metric("Safe/Good Cards", f"{safe_cards} cards", help="Cards that keep or improve your equity.")
 
         # Heatmap
+        import plotly.express as px
         order = list("AKQJT98765432")
         piv = df.pivot_table(index="Rank", columns="Suit", values="Equity").reindex(order)[list("shdc")]
         fig = px.imshow(piv, x=['s♠','h♥','d♦','c♣'], y=order, color_continuous_scale="RdBu_r", zmin=0, zmax=100, text_auto=".0f")
@@ -355,13 +429,14 @@ if hero_range and villain_range:
         # --- 4. Range Distribution ---
         st.divider()
         st.subheader("4. Range Distribution")
-        he, ve = analyze_range_distribution(hero_range, villain_range, board_objs, iterations=sim_iterations)
+        he, ve = cached_distribution(tree, hero_range, villain_range, board_objs, sim_iterations)
         if he and ve:
+            import plotly.graph_objects as go
             hist = go.Figure()
             hist.add_trace(go.Histogram(x=he, name='Hero', marker_color='blue', opacity=0.7, xbins=dict(start=0,end=100,size=5)))
             hist.add_trace(go.Histogram(x=ve, name='Villain', marker_color='red', opacity=0.7, xbins=dict(start=0,end=100,size=5)))
             hist.update_layout(barmode='overlay', width=800, height=400, xaxis_title="Equity %")
             st.plotly_chart(hist)
 
-    else:
+    elif len(board_objs) >= 5:
         st.success("River Reached (All cards dealt)")
\ No newline at end of file
@@ -1,11 +1,9 @@
 import streamlit as st
+import os
+import json
 import random
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from treys import Card, Evaluator
-from collections import Counter
+from equity_core import str_to_card, card_to_str, parse_range_notation, calculate_equity, simulate_equity, get_evaluator
+# pandas / plotly は重いので、使うセクションの描画時にだけ import する
 
 st.set_page_config(page_title="Poker Equity Tool", layout="wide")
 
@@ -74,17 +72,26 @@ st.markdown("""
 
 # Treys評価機
 @st.cache_resource
-def load_evaluator(): return Evaluator()
-try:
-    with st.spinner('Loading engine...'): evaluator = load_evaluator()
+def load_evaluator(): return get_evaluator()
+try: evaluator = load_evaluator()
 except: st.stop()
 
 # ==========================================
 # State管理
 # ==========================================
+def default_iterations(engine, fallback=500):
+    # validate_equity.py --write の計測結果から、目標精度を満たす反復回数を既定値にする
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "equity_accuracy.json")) as f: data = json.load(f)
+        n = data["engines"][engine]["iterations_to_accuracy"][str(data["default_target"])]
+        return max(100, min(5000, round(n / 100) * 100)), data["default_target"]
+    except: return fallback, None
+
 with st.sidebar:
     st.header("🔧 Settings")
-    sim_iterations = st.slider("Iterations", 100, 5000, 500, 100)
+    def_iter, def_target = default_iterations("equity_core.py")
+    sim_iterations = st.slider("Iterations", 100, 5000, def_iter, 100,
+                               help=f"Default: ±{def_target}% (95%) in validate_equity.py" if def_target else None)
     if st.button("Reset", type="primary"):
         for k in st.session_state.keys(): del st.session_state[k]
         st.rerun()
@@ -105,47 +112,6 @@ def get_range_string_from_percent(start_p, end_p):
     sel = HAND_ORDER[s_idx:e_idx]
     return ", ".join(sel) if sel else ""
 
-def card_to_str(card_int): return Card.int_to_str(card_int)
-def str_to_card(card_str):
-    clean = card_str.replace("10", "T").replace("0", "T")
-    try: return Card.new(clean)
-    except: return None
-
-def parse_range_notation(range_str):
-    ranks = '23456789TJQKA'; suits = 'cdhs'; combos = [] 
-    if not range_str: return []
-    parts = [p.strip() for p in range_str.split(',')]
-    for part in parts:
-        if len(part) < 2: continue
-        part = part.replace("10", "T")
-        if len(part) == 4 and part[1] in suits and part[3] in suits:
-            try:
-                c1 = str_to_card(part[:2]); c2 = str_to_card(part[2:])
-                if c1 and c2: combos.append([c1, c2])
-                continue
-            except: pass
-        try:
-            r1=part[0]; r2=part[1]; r1i=ranks.find(r1); r2i=ranks.find(r2)
-            if r1i==-1 or r2i==-1: continue
-            is_plus='+' in part; is_s='s' in part; is_o='o' in part
-            if r1i == r2i:
-                top = 12 if is_plus else r1i
-                for r in range(r1i, top+1):
-                    for i in range(4):
-                        for j in range(i+1, 4): combos.append([str_to_card(ranks[r]+suits[i]), str_to_card(ranks[r]+suits[j])])
-            else:
-                if r1i < r2i: r1i, r2i, r1, r2 = r2i, r1i, r2, r1
-                top_k = r1i - 1 if is_plus else r2i
-                for k in range(r2i, top_k+1):
-                    if is_s or (not is_o and not is_s):
-                        for s in suits: combos.append([str_to_card(r1+s), str_to_card(ranks[k]+s)])
-                    if is_o or (not is_o and not is_s):
-                        for s1 in suits:
-                            for s2 in suits:
-                                if s1!=s2: combos.append([str_to_card(r1+s1), str_to_card(ranks[k]+s2)])
-        except: continue
-    return combos
-
 def create_range_grid_visual(combo_list):
     rank_map = {r: i for i, r in enumerate("AKQJT98765432")}
     grid_data = [[0]*13 for _ in range(13)]
@@ -242,28 +208,8 @@ def edit_board_dialog():
 # ==========================================
 # Logic
 # ==========================================
-def calculate_equity(hero_range, villain_range, board, iterations=1000, silent=False):
-    h_wins = 0; ties = 0; full_deck = []
-    for r in "23456789TJQKA":
-        for s in "shdc": full_deck.append(str_to_card(r+s))
-    if not hero_range or not villain_range: return 0.0
-    for i in range(iterations):
-        hh = random.choice(hero_range); vh = random.choice(villain_range)
-        used = set(board) | set(hh) | set(vh)
-        if len(used) != len(board) + 4: continue
-        rem = [c for c in full_deck if c not in used]
-        need = 5 - len(board); 
-        if need < 0: need = 0
-        if len(rem) < need: continue
-        run = random.sample(rem, need) if need > 0 else []
-        final_board = board + run
-        hs = evaluator.evaluate(final_board, hh)
-        vs = evaluator.evaluate(final_board, vh)
-        if hs < vs: h_wins += 1
-        elif hs == vs: ties += 1
-    return (h_wins + ties/2) / iterations * 100
-
 def analyze_runouts(hero_range, villain_range, board, iterations=500):
+    import pandas as pd
     full_deck = []
     for r in "23456789TJQKA":
         for s in "shdc": full_deck.append(str_to_card(r+s))
@@ -272,19 +218,69 @@ def analyze_runouts(hero_range, villain_range, board, iterations=500):
     status = st.empty(); status.caption(f"Analyzing... ({iterations} iter)")
     prog = st.progress(0); total = len(deck)
     for idx, c in enumerate(deck):
-        eq = calculate_equity(hero_range, villain_range, board + [c], iterations, True)
+        eq, n = simulate_equity(hero_range, villain_range, board + [c], iterations)
         c_str = card_to_str(c)
-        res.append({"Card": c_str, "Rank": c_str[0], "Suit": c_str[1], "Equity": eq})
+        res.append({"Card": c_str, "Rank": c_str[0], "Suit": c_str[1], "Equity": eq, "Samples": n})
         prog.progress((idx+1)/total)
     prog.empty(); status.empty()
     return pd.DataFrame(res)
 
+# ==========================================
+# Board Tree (ストリート間の結果再利用)
+# ==========================================
+def get_board_tree(hero_str, villain_str):
+    # レンジが変わったらツリーを作り直す
+    key = (hero_str, villain_str)
+    if st.session_state.get('board_tree_key') != key:
+        st.session_state['board_tree_key'] = key
+        st.session_state['board_tree'] = {}
+    return st.session_state['board_tree']
+
+def get_board_node(tree, board):
+    key = tuple(sorted(card_to_str(c) for c in board))
+    # n: 有効サンプル数 (重み), requested: 要求した反復回数 (追加サンプリングの判定用)
+    return tree.setdefault(key, {"eq": 0.0, "n": 0, "requested": 0,
+                                 "runouts": None, "runouts_n": 0, "dist": None, "dist_n": 0})
+
+def merge_estimate(node, eq, n, requested):
+    if n > 0:
+        node["eq"] = (node["eq"] * node["n"] + eq * n) / (node["n"] + n)
+        node["n"] += n
+    node["requested"] += requested
+
+def cached_equity(tree, hero_range, villain_range, board, iterations):
+    # 前ストリートの1枚ごとの推定値をウォームスタートにし、不足分だけ追加サンプリング
+    node = get_board_node(tree, board)
+    if node["requested"] < iterations:
+        extra = iterations - node["requested"]
+        eq, n = simulate_equity(hero_range, villain_range, board, extra)
+        merge_estimate(node, eq, n, extra)
+    return node["eq"]
+
+def cached_runouts(tree, hero_range, villain_range, board, iterations):
+    node = get_board_node(tree, board)
+    if node["runouts"] is None or node["runouts_n"] < iterations:
+        df = analyze_runouts(hero_range, villain_range, board, iterations)
+        node["runouts"] = df; node["runouts_n"] = iterations
+        # 次のカードごとの結果を子ノードに保存 -> ヒートマップ/ダイアログで進んだ時に再利用
+        for c, eq, n in zip(df["Card"], df["Equity"], df["Samples"]):
+            merge_estimate(get_board_node(tree, board + [str_to_card(c)]), eq, int(n), iterations)
+    return node["runouts"].copy()
+
+def cached_distribution(tree, hero_range, villain_range, board, iterations):
+    # ボードを戻した時にも再計算しない
+    node = get_board_node(tree, board)
+    if node["dist"] is None or node["dist_n"] < iterations:
+        node["dist"] = analyze_range_distribution(hero_range, villain_range, board, iterations)
+        node["dist_n"] = iterations
+    return node["dist"]
+
 def analyze_range_distribution(hero_range, villain_range, board, iterations=500):
     size = 100
     hs = random.sample(hero_range, size) if len(hero_range)>size else hero_range
     vs = random.sample(villain_range, size) if len(villain_range)>size else villain_range
-    he = [calculate_equity([h], villain_range, board, iterations, True) for h in hs]
-    ve = [calculate_equity([h], hero_range, board, iterations, True) for h in vs]
+    he = [calculate_equity([h], villain_range, board, iterations) for h in hs]
+    ve = [calculate_equity([h], hero_range, board, iterations) for h in vs]
     return he, ve
 
 # ==========================================
@@ -313,6 +309,7 @@ with st.container():
         hero_in = st.text_area("Hero Range Text", key="hero_range_val", height=70)
         h_combos = parse_range_notation(hero_in)
         if h_combos:
+            import plotly.express as px
             st.caption(f"{len(h_combos)} combos")
             grid_h = create_range_grid_visual(h_combos)
             # 修正: x, yにラベルを指定し、category型にする
@@ -333,6 +330,7 @@ with st.container():
         villain_in = st.text_area("Villain Range Text", key="villain_range_val", height=70)
         v_combos = parse_range_notation(villain_in)
         if v_combos:
+            import plotly.express as px
             st.caption(f"{len(v_combos)} combos")
             grid_v = create_range_grid_visual(v_combos)
             # 修正: x, yにラベルを指定
@@ -367,14 +365,18 @@ hero_range = parse_range_notation(hero_in)
 villain_range = parse_range_notation(villain_in)
 
 if hero_range and villain_range:
-    eq = calculate_equity(hero_range, villain_range, board_objs, iterations=sim_iterations)
+    tree = get_board_tree(hero_in, villain_in)
+    eq = cached_equity(tree, hero_range, villain_range, board_objs, sim_iterations)
     c1,c2,c3 = st.columns([1,2,1])
     with c1: st.metric("Win%", f"{eq:.1f}%")
     with c2: st.progress(eq/100)
     
     st.subheader("3. Dynamics")
-    if len(board_objs) < 5:
-        df = analyze_runouts(hero_range, villain_range, board_objs, iterations=sim_iterations)
+    # 次のカード全通り + レンジ分布は重いので、要求されるまで実行しない (初回表示を速くする)
+    run_dynamics = st.toggle("Analyze next cards & range distribution", key="run_dynamics",
+                             help=f"Simulates every next card and 200 sampled hands ({sim_iterations} iter each)")
+    if len(board_objs) < 5 and run_dynamics:
+        df = cached_runouts(tree, hero_range, villain_range, board_objs, sim_iterations)
         df['Loss'] = eq - df['Equity']
         bad = df[df['Loss'] > 0]
         
@@ -384,6 +386,7 @@ if hero_range and villain_range:
         with c3: st.metric("Safe", f"{len(df)-len(bad)}", help="Safe cards")
 
         # ヒートマップ修正: ラベル追加
+        import plotly.express as px
         order = list("AKQJT98765432")
         piv = df.pivot_table(index="Rank", columns="Suit", values="Equity").reindex(order)[list("shdc")]
         fig = px.imshow(piv, x=['s♠','h♥','d♦','c♣'], y=order, color_continuous_scale="RdBu_r", zmin=0, zmax=100, text_auto=".0f")
@@ -392,10 +395,11 @@ if hero_range and villain_range:
         st.plotly_chart(fig, use_container_width=True)
         
         st.subheader("4. Range Distribution")
-        he, ve = analyze_range_distribution(hero_range, villain_range, board_objs, iterations=sim_iterations)
+        import plotly.graph_objects as go
+        he, ve = cached_distribution(tree, hero_range, villain_range, board_objs, sim_iterations)
         hist = go.Figure()
         hist.add_trace(go.Histogram(x=he, name='Hero', marker_color='blue', opacity=0.7))
         hist.add_trace(go.Histogram(x=ve, name='Villain', marker_color='red', opacity=0.7))
         hist.update_layout(barmode='overlay', width=300, height=300, margin=dict(l=0,r=0,t=0,b=0), xaxis_title="Equity %")
         st.plotly_chart(hist, use_container_width=True)
-    else: st.success("River Reached")
+    elif len(board_objs) >= 5: st.success("River Reached")
@@ -0,0 +1,32 @@
+import os
+
+from hand_history import iter_hands, iter_spots, new_stats, parse_allin_spot
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "hand_history.txt")
+
+def _spots():
+    return {h[0].split("#")[1].split(":")[0]: parse_allin_spot(h) for h in iter_hands([FIXTURE])}
+
+def test_sitting_out_seat_is_not_an_active_player():
+    spot = _spots()["2001"]
+    assert (spot["player"], spot["opponent"]) == ("alice", "bob")
+    assert spot["cards"] == ["Ah", "Ad"] and spot["opp_cards"] == ["Kc", "Kd"]
+    assert spot["allin_board"] == [] and spot["final_board"] == ["2c", "7d", "9h", "Js", "3c"]
+    assert spot["invested"] == 50 and spot["won"] == 100
+
+def test_uncalled_bet_is_returned():
+    spot = _spots()["2002"]
+    assert spot["invested"] == 60
+    assert spot["pot"] == 120 and spot["won"] == 0
+
+def test_allin_with_rake():
+    spot = _spots()["2003"]
+    assert spot["allin_board"] == ["Th", "8h", "2c"]
+    assert spot["invested"] == 100
+    assert spot["pot"] == 197
+
+def test_stats_count_read_and_skipped_hands():
+    stats = new_stats()
+    spots = list(iter_spots([FIXTURE], stats))
+    assert [s["hand_id"] for s in spots] == ["2001", "2002", "2003"]
+    assert (stats["hands"], stats["spots"], stats["skipped"], stats["errors"]) == (4, 3, 1, 0)
@@ -0,0 +1,162 @@
+import os
+import ast
+import sys
+import json
+import math
+import random
+import argparse
+
+import equity_core
+
+# ==========================================
+# Equity Validation Harness
+# 各サンプリングエンジンを固定コーパスの厳密解 (全列挙) と比較し、
+# バイアス・反復回数ごとの誤差・目標精度に必要な反復回数を計測する。
+#
+#   python validate_equity.py            # 計測のみ (バイアスがあれば exit 1)
+#   python validate_equity.py --write    # equity_accuracy.json を更新 (サイドバーの既定値)
+# ==========================================
+HERE = os.path.dirname(os.path.abspath(__file__))
+ACCURACY_PATH = os.path.join(HERE, "equity_accuracy.json")
+
+# (名前, Hero, Villain, Board) -- 全列挙が数秒で終わる大きさに抑える
+CORPUS = [
+    ("flop_hands",     "AhKh",              "QsQd",                  "Th 8h 2c"),
+    ("flop_ranges",    "QQ+, AKs",          "JJ, TT, AQs",           "Th 8d 2c"),
+    ("turn_default",   "QQ+, AKs, AKo",     "TT+, AJs+, KQs, AQo+",  "Th 8d 2c 5s"),
+    ("turn_blocked",   "AKs",               "22+",                   "As 7s 3d 9c"),
+    ("river_default",  "QQ+, AKs, AKo",     "TT+, AJs+, KQs, AQo+",  "Th 8d 2c 5s Jh"),
+]
+ITERATIONS = [100, 250, 500, 1000, 2000]
+TARGETS = [1.0, 2.0, 5.0]
+# サイドバー既定値の目標精度 (95%の確率で ±この値以内)
+DEFAULT_TARGET = 5.0
+Z95 = 1.96
+REPEATS = 40
+# 3SE (ノイズ) に加えて許容するバイアス (% points)
+BIAS_TOLERANCE = 0.5
+
+# ==========================================
+# Engines
+# range_dynamics_checker.py は equity_core を使う。nlhe_range_check.py (eval7) は
+# Streamlit スクリプトなので import できない -> 必要な関数だけをソースから取り出して実行する
+# ==========================================
+APP_FUNCTIONS = {"calculate_equity", "simulate_equity", "parse_range_notation"}
+
+def _load_app_functions(filename, namespace):
+    with open(os.path.join(HERE, filename), encoding="utf-8") as f: tree = ast.parse(f.read())
+    body = [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name in APP_FUNCTIONS]
+    exec(compile(ast.Module(body=body, type_ignores=[]), filename, "exec"), namespace)
+    return namespace
+
+def _eval7_app_engine():
+    try: import eval7
+    except ImportError: return None
+    ns = _load_app_functions("nlhe_range_check.py", {"eval7": eval7, "random": random})
+    def run(hero_str, villain_str, board_str, iterations, rng):
+        ns["random"] = rng
+        board = [eval7.Card(c) for c in board_str.split()]
+        return ns["calculate_equity"](ns["parse_range_notation"](hero_str), ns["parse_range_notation"](villain_str),
+                                      board, iterations, True)
+    return run
+
+def _core_engine():
+    def run(hero_str, villain_str, board_str, iterations, rng):
+        board = [equity_core.str_to_card(c) for c in board_str.split()]
+        return equity_core.calculate_equity(equity_core.parse_range_notation(hero_str),
+                                            equity_core.parse_range_notation(villain_str), board, iterations, rng)
+    return run
+
+def load_engines():
+    engines = {"equity_core.py": _core_engine(),
+               "nlhe_range_check.py": _eval7_app_engine()}
+    return {k: v for k, v in engines.items() if v is not None}
+
+# ==========================================
+# Measurement
+# ==========================================
+def exact_reference(spot):
+    _, hero_str, villain_str, board_str = spot
+    board = [equity_core.str_to_card(c) for c in board_str.split()]
+    return equity_core.exact_range_equity(equity_core.parse_range_notation(hero_str),
+                                          equity_core.parse_range_notation(villain_str), board)
+
+def measure_engine(engine, spot, exact, iterations_grid, repeats, seed=0):
+    name, hero_str, villain_str, board_str = spot
+    curve = []
+    for n in iterations_grid:
+        errs = []
+        for r in range(repeats):
+            rng = random.Random(f"{seed}-{name}-{n}-{r}")
+            errs.append(engine(hero_str, villain_str, board_str, n, rng) - exact)
+        bias = sum(errs) / repeats
+        sd = math.sqrt(sum((e - bias) ** 2 for e in errs) / max(1, repeats - 1))
+        curve.append({"iterations": n, "bias": bias, "sd": sd,
+                      "rmse": math.sqrt(sum(e * e for e in errs) / repeats),
+                      "bias_se": sd / math.sqrt(repeats)})
+    return curve
+
+def significant_bias(curve, tolerance=BIAS_TOLERANCE):
+    # 最大反復回数の点で 3SE + tolerance を超えるバイアスだけを実在とみなす (それ以外は 0)
+    c = curve[-1]
+    return abs(c["bias"]) if abs(c["bias"]) > 3 * c["bias_se"] + tolerance else 0.0
+
+def iterations_for_target(curves, target, tolerance=BIAS_TOLERANCE):
+    # 最悪のスポットで |bias| + 1.96·sd が target 以内になる反復回数 (sd ∝ 1/√n で外挿)
+    # バイアスは反復回数で減らないので、|bias| >= target なら到達不能 (None)
+    need = 0
+    for curve in curves:
+        bias = significant_bias(curve, tolerance)
+        if bias >= target: return None
+        c = max(c["sd"] * math.sqrt(c["iterations"]) for c in curve)
+        need = max(need, (Z95 * c / (target - bias)) ** 2)
+    return int(math.ceil(need / 100.0) * 100)
+
+def biased_spots(curves_by_spot, tolerance=BIAS_TOLERANCE):
+    return [(name, curve[-1]["bias"]) for name, curve in curves_by_spot.items()
+            if significant_bias(curve, tolerance) > 0]
+
+def run_validation(iterations_grid=ITERATIONS, repeats=REPEATS, seed=0, bias_tolerance=BIAS_TOLERANCE, log=print):
+    engines = load_engines()
+    exacts = {}
+    for spot in CORPUS:
+        exacts[spot[0]] = exact_reference(spot)
+        log(f"exact {spot[0]:<15} {exacts[spot[0]]:6.2f}%")
+    report = {"iterations": list(iterations_grid), "repeats": repeats, "bias_tolerance": bias_tolerance, "targets": TARGETS,
+              "default_target": DEFAULT_TARGET, "exact": exacts, "engines": {}}
+    for engine_name, engine in engines.items():
+        curves = {spot[0]: measure_engine(engine, spot, exacts[spot[0]], iterations_grid, repeats, seed)
+                  for spot in CORPUS}
+        table = {str(t): iterations_for_target(curves.values(), t, bias_tolerance) for t in TARGETS}
+        report["engines"][engine_name] = {
+            "curves": curves, "iterations_to_accuracy": table,
+            "biased_spots": biased_spots(curves, bias_tolerance),
+        }
+    return report
+
+def print_report(report, log=print):
+    for engine_name, r in report["engines"].items():
+        log(f"\n== {engine_name}")
+        log(f"{'spot':<15}" + "".join(f"{n:>16}" for n in report["iterations"]) + "   (bias / rmse, % points)")
+        for spot, curve in r["curves"].items():
+            log(f"{spot:<15}" + "".join(f"{c['bias']:>+8.2f}/{c['rmse']:<7.2f}" for c in curve))
+        log("iterations to accuracy (95%): " + ", ".join(
+            f"±{t}% -> {n if n is not None else 'unreachable (biased)'}" for t, n in r["iterations_to_accuracy"].items()))
+        for spot, bias in r["biased_spots"]: log(f"BIASED: {spot} ({bias:+.2f} points)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate sampling equity engines against exact enumeration.")
+    ap.add_argument("--repeats", type=int, default=REPEATS)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--bias-tolerance", type=float, default=BIAS_TOLERANCE, help="Allowed bias in equity points beyond 3 standard errors")
+    ap.add_argument("--write", action="store_true", help=f"Write {os.path.basename(ACCURACY_PATH)} (feeds the sidebar default)")
+    a = ap.parse_args()
+    report = run_validation(ITERATIONS, a.repeats, a.seed, a.bias_tolerance)
+    print_report(report)
+    if a.write:
+        with open(ACCURACY_PATH, "w") as f: json.dump(report, f, indent=1)
+        print(f"\nWrote {ACCURACY_PATH}")
+    sys.exit(1 if any(r["biased_spots"] for r in report["engines"].values()) else 0)
+
+if __name__ == "__main__":
+    main()